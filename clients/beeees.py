@@ -1,11 +1,28 @@
 from __future__ import annotations
 
 import asyncio
-import json
+import os
 import platform
-from collections.abc import Iterable, Mapping
+from collections.abc import Mapping, Sequence
 from enum import Enum, auto
-from typing import Union, Iterator, Literal, Callable, NewType
+from typing import Union, Optional, Iterator, Literal, Callable, NewType
+
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:
+    import json
+
+    _json_loads = json.loads
+
+    def _json_dumps(data) -> bytes:
+        return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+# Set the `BEEEES_DEBUG` environment variable to log every message sent.
+_DEBUG = __debug__ and bool(os.environ.get("BEEEES_DEBUG"))
 
 
 BeeID = NewType("BeeID", int)
@@ -37,12 +54,23 @@ class Tile(Enum):
         return self != Tile.Block
 
 
+# Tiles are stored compactly as one byte each, using the enum value as the code.
+_TILE_CODE = {t.name: t.value for t in Tile}
+_TILE_BY_CODE = {t.value: t for t in Tile}
+_PASSABLE_TABLE = bytes(
+    int(code in _TILE_BY_CODE and _TILE_BY_CODE[code].is_passable())
+    for code in range(256)
+)
+
+
 class World(Mapping[Position, Tile]):
     """The world map, a mapping from `Position` to `Tile`.
 
     Attributes:
     - `width`: the width of the map.
     - `height`: the height of the map.
+    - `passable_mask`: one byte per tile (in the same order as `code_at`),
+      1 if `Bee`s can pass over the tile and 0 otherwise.
     - `[x, y]`: the `Tile` at position `(x, y)`.
     """
 
@@ -50,13 +78,25 @@ class World(Mapping[Position, Tile]):
         """Initialize the world from the given dictionary."""
         self.width = int(data["width"])
         self.height = int(data["height"])
-        self._tiles = list(Tile[t] for t in data["map"])
+        self._tiles = bytes(map(_TILE_CODE.__getitem__, data["map"]))
+        self.passable_mask = self._tiles.translate(_PASSABLE_TABLE)
 
     def __getitem__(self, key: Position) -> Tile:
         """Get the `Tile` at the given `Position`."""
         (x, y) = key
-        if 0 <= x < self.width or 0 <= y < self.height:
-            raise KeyError
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise KeyError(key)
+        return _TILE_BY_CODE[self._tiles[x + y * self.width]]
+
+    def get_unchecked(self, x: int, y: int) -> Tile:
+        """Get the `Tile` at `(x, y)`, without checking it's within bounds.
+
+        Positions outside the map give meaningless results (or `IndexError`).
+        """
+        return _TILE_BY_CODE[self._tiles[x + y * self.width]]
+
+    def code_at(self, x: int, y: int) -> int:
+        """Get the raw code of the tile at `(x, y)`; `Tile(code)` recovers it."""
         return self._tiles[x + y * self.width]
 
     def __iter__(self) -> Iterator[Position]:
@@ -81,13 +121,18 @@ class Bee(object):
     - `position`: a `Position` with the bee's current location in the world.
     """
 
+    __slots__ = ("id", "player", "energy", "pollen", "position")
+
     def __init__(self, bee):
         """Initialize the bee from the given dictionary."""
-        self.id = BeeID(bee["id"])
-        self.player = PlayerID(bee["player"])
+        # constructed for every bee each update, so avoid extra function calls:
+        # `BeeID`/`PlayerID` are no-ops at runtime, and `make_position` is inlined
+        self.id: BeeID = bee["id"]
+        self.player: PlayerID = bee["player"]
         self.energy = int(bee["energy"])
         self.pollen = int(bee["pollen"])
-        self.position = make_position(bee["position"])
+        pos = bee["position"]
+        self.position: Position = (pos["x"], pos["y"])
 
 
 class Flower(object):
@@ -99,11 +144,14 @@ class Flower(object):
     - `position`: a `Position` with the flower's location in the world.
     """
 
+    __slots__ = ("pollen", "is_pollinated", "position")
+
     def __init__(self, flower):
         """Initialize the flower from the given dictionary."""
         self.pollen = int(flower["pollen"])
         self.is_pollinated = bool(flower["is_pollinated"])
-        self.position = make_position(flower["position"])
+        pos = flower["position"]
+        self.position: Position = (pos["x"], pos["y"])
 
 
 class Hive(object):
@@ -114,10 +162,13 @@ class Hive(object):
     - `position`: a `Position` with the hive's location in the world.
     """
 
+    __slots__ = ("player", "position")
+
     def __init__(self, hive):
         """Initialize the hive from the given dictionary."""
-        self.player = PlayerID(hive["player"])
-        self.position = make_position(hive["position"])
+        self.player: PlayerID = hive["player"]
+        pos = hive["position"]
+        self.position: Position = (pos["x"], pos["y"])
 
 
 class Entities(object):
@@ -138,16 +189,70 @@ class Entities(object):
         self.bees = [Bee(b) for b in data["bees"]]
         self.flowers = [Flower(f) for f in data["flowers"]]
         self.hives = [Hive(h) for h in data["hives"]]
+        self._index()
+
+    @classmethod
+    def reusing(cls, data, previous: Optional[Entities]) -> Entities:
+        """Create the entity collection, reusing entities from `previous`.
+
+        Bees (matched by `id`) and flowers (matched by `position`)
+        that are still present are updated in-place rather than recreated,
+        so the entities in `previous` no longer hold their old values.
+        `previous` must itself have been created by `reusing` (or be `None`).
+        """
+        self = cls.__new__(cls)
+        old_bees = previous._bee_by_id if previous is not None else {}
+        old_flowers = previous._flower_by_position if previous is not None else {}
+
+        # the updates are inlined to avoid an extra call per entity
+        self.bees = []
+        self._bee_by_id = {}
+        for b in data["bees"]:
+            bee = old_bees.get(b["id"])
+            if bee is None:
+                bee = Bee(b)
+            else:
+                bee.player = b["player"]
+                bee.energy = int(b["energy"])
+                bee.pollen = int(b["pollen"])
+                pos = b["position"]
+                bee.position = (pos["x"], pos["y"])
+            self.bees.append(bee)
+            self._bee_by_id[bee.id] = bee
+
+        self.flowers = []
+        self._flower_by_position = {}
+        for f in data["flowers"]:
+            pos = f["position"]
+            key = (pos["x"], pos["y"])
+            flower = old_flowers.get(key)
+            if flower is None or key in self._flower_by_position:
+                flower = Flower(f)
+            else:
+                flower.pollen = int(f["pollen"])
+                flower.is_pollinated = bool(f["is_pollinated"])
+            self.flowers.append(flower)
+            self._flower_by_position[key] = flower
+
+        # there's only one hive per player, so not worth reusing
+        self.hives = [Hive(h) for h in data["hives"]]
+        self._index()
+        return self
 
-    def bees_for(self, player: PlayerID) -> Iterable[Bee]:
-        """Get an iterable of bees, filtered for just the given player."""
+    def _index(self) -> None:
+        """Build the per-player lookups."""
+        self._hive_by_player = {h.player: h for h in self.hives}
+        self._bees_by_player: dict[PlayerID, list[Bee]] = {}
         for bee in self.bees:
-            if bee.player == player:
-                yield bee
+            self._bees_by_player.setdefault(bee.player, []).append(bee)
+
+    def bees_for(self, player: PlayerID) -> Sequence[Bee]:
+        """Get a sequence of bees, filtered for just the given player."""
+        return self._bees_by_player.get(player, ())
 
     def hive_for(self, player: PlayerID) -> Hive:
         """Get the hive (spawn point) for the given player."""
-        return next(h for h in self.hives if h.player == player)
+        return self._hive_by_player[player]
 
 
 class Error(Exception):
@@ -169,22 +274,94 @@ class ConnectionError(Error):
         super().__init__("connection dropped")
 
 
+# How many bytes may be queued for sending before writes wait for them to drain.
+WRITE_BUFFER_HIGH_WATER = 64 * 1024
+
+
+class BeeeesProtocol(asyncio.Protocol):
+    """Splits the incoming byte stream into newline-terminated messages.
+
+    Received data is accumulated into a single buffer,
+    and each complete line is pushed onto `queue` (without the newline).
+    Once the connection is lost, `None` is pushed to signal the end of stream.
+
+    Attributes:
+    - `transport`: The underlying transport, once connected.
+    - `queue`: The queue of complete messages received so far.
+    """
+
+    transport: asyncio.Transport
+    queue: asyncio.Queue[Union[bytes, None]]
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+        self._buf = bytearray()
+        self._scan_pos = 0
+        self._can_write = asyncio.Event()
+        self._can_write.set()
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+        transport.set_write_buffer_limits(high=WRITE_BUFFER_HIGH_WATER)
+
+    def data_received(self, data: bytes) -> None:
+        buf = self._buf
+        buf += data
+        start = 0
+        # copy each message out of the buffer exactly once
+        with memoryview(buf) as view:
+            while True:
+                end = buf.find(b"\n", self._scan_pos)
+                if end < 0:
+                    break
+                self.queue.put_nowait(bytes(view[start:end]))
+                start = self._scan_pos = end + 1
+        # only discard consumed data once, and remember how far we've looked
+        # so that long messages over many packets aren't rescanned each time
+        del buf[:start]
+        self._scan_pos = len(buf)
+
+    def connection_lost(self, exc) -> None:
+        self.queue.put_nowait(None)
+        self._can_write.set()
+
+    @property
+    def writing_paused(self) -> bool:
+        """Whether the transport's write buffer is over its high-water mark."""
+        return not self._can_write.is_set()
+
+    def pause_writing(self) -> None:
+        self._can_write.clear()
+
+    def resume_writing(self) -> None:
+        self._can_write.set()
+
+    async def drain(self) -> None:
+        """Wait until the transport's write buffer has room again."""
+        await self._can_write.wait()
+
+
 class Connection(object):
     """Wraps a connection with the server.
 
     Attributes:
-    - `reader`: The read half of the connection.
-    - `writer`: The write half of the connection.
+    - `transport`: The transport used to write to the connection.
+    - `protocol`: The `BeeeesProtocol` that receives messages.
     """
 
-    reader: asyncio.StreamReader
-    writer: asyncio.StreamWriter
+    __slots__ = ("transport", "protocol")
+
+    transport: asyncio.Transport
+    protocol: BeeeesProtocol
 
     @classmethod
     async def create(cls, host: str, port: Union[int, str]) -> Connection:
         """Open a new connection with the given `host` and `port`."""
         self = cls()
-        self.reader, self.writer = await asyncio.open_connection(host, port)
+        loop = asyncio.get_running_loop()
+        self.transport, self.protocol = await loop.create_connection(
+            BeeeesProtocol, host, port
+        )
         return self
 
     async def write(self, msg: Union[str, bytes]) -> None:
@@ -192,38 +369,54 @@ class Connection(object):
 
         If passed a string, will encode using UTF-8.
         All messages are terminated with a newline.
-        Will flush the stream before finishing.
+        Only waits for the stream to flush if more than
+        `WRITE_BUFFER_HIGH_WATER` bytes are still waiting to be sent.
         """
-        if isinstance(msg, bytes):
-            self.writer.write(msg)
-        else:
-            self.writer.write(msg.encode("utf-8"))
-        self.writer.write(b"\n")
-        await self.writer.drain()
+        if not isinstance(msg, bytes):
+            msg = msg.encode("utf-8")
+        self.transport.write(msg + b"\n")
+        if self.protocol.writing_paused:
+            await self.protocol.drain()
 
     async def write_json(self, data) -> None:
         """Write a blob as JSON-encoded data to the connection.
 
         Uses the same encoding and flushing behaviour as `write`.
         """
-        print(f"Sending: {data}")
-        await self.write(json.dumps(data, separators=(",", ":")))
+        if _DEBUG:
+            print(f"Sending: {data}")
+        await self.write(_json_dumps(data))
 
-    async def read(self) -> str:
+    async def read(self) -> bytes:
         """Read a message from the connection.
 
-        Returns a single newline-terminated UTF-8 encoded string.
+        Returns a single line of UTF-8 encoded JSON (without the newline),
+        as raw bytes ready to be passed to the JSON decoder.
         If the connection has been dropped, raises `ConnectionError`.
         """
-        line = await self.reader.readline()
-        if not line:
+        line = await self.protocol.queue.get()
+        if line is None:
+            # leave the end-of-stream marker for any later reads
+            self.protocol.queue.put_nowait(None)
             raise ConnectionError()
-        return line.decode("utf-8")
+        return line
 
 
 Moves = dict[BeeID, Direction]
 StepFunc = Callable[[PlayerID, World, Entities], Moves]
 
+# Pieces of the JSON "moves" packet, which is formatted by hand.
+_MOVES_HEAD = b'{"type":"moves","moves":['
+_MOVES_TAIL = b"]}"
+_MOVE_FMT = b'{"bee":%d,"direction":%s}'
+_DIRECTION_JSON = {
+    "North": b'"North"',
+    "East": b'"East"',
+    "South": b'"South"',
+    "West": b'"West"',
+    None: b"null",
+}
+
 
 class Client(object):
     """Encapsulates a client program in the game.
@@ -232,26 +425,38 @@ class Client(object):
     - `conn`: The `Connection` to the server.
     - `id`: The client's player ID.
     - `world`: The (immutable) game world.
+    - `reuse_entities`: Whether to update the previous round's entities
+      in-place rather than creating new ones each round.
     """
 
+    __slots__ = ("conn", "id", "world", "reuse_entities", "_entities")
+
     conn: Connection
     id: PlayerID
     world: World
+    reuse_entities: bool
+    _entities: Optional[Entities]
 
     @classmethod
-    async def register(cls, conn: Connection, name: str) -> Client:
+    async def register(
+        cls, conn: Connection, name: str, reuse_entities: bool = False
+    ) -> Client:
         """Create a new client.
 
         Registers to the server over the provided connection `conn`.
         Specifies the player name as `name`;
         this can be used to reconnect to an existing session later on.
+        If `reuse_entities` is set, entity objects are updated in-place
+        each round instead of being created afresh.
         """
         self = cls()
         self.conn = conn
+        self.reuse_entities = reuse_entities
+        self._entities = None
 
         await self.conn.write_json({"type": "register", "name": name})
         msg = await self.conn.read()
-        packet = json.loads(msg)
+        packet = _json_loads(msg)
         if packet["type"] == "done":
             raise Error("game already finished")
         elif packet["type"] == "error":
@@ -260,7 +465,7 @@ class Client(object):
             self.id = PlayerID(packet["player"])
             self.world = World(packet["world"])
         else:
-            raise Error(f"unexpected message on registration: {msg}")
+            raise Error(f"unexpected message on registration: {msg!r}")
 
         return self
 
@@ -273,30 +478,62 @@ class Client(object):
         """
         while True:
             msg = await self.conn.read()
-            packet = json.loads(msg)
-            if packet["type"] == "done":
-                print("Received finish signal")
-                return
-            elif packet["type"] == "warning":
-                print("Received warning:", packet["msg"])
-            elif packet["type"] == "error":
-                print(f"Recevied error:", packet["msg"])
+            packet = _json_loads(msg)
+            handler = self._HANDLERS.get(packet["type"])
+            if handler is None:
+                raise Error(f"unknown message: {msg!r}")
+            if await handler(self, packet, step):
                 return
-            elif packet["type"] == "update":
-                entities = Entities(packet["data"])
-                moves = step(self.id, self.world, entities)
-                data = {
-                    "type": "moves",
-                    "moves": list(
-                        {"bee": k, "direction": v} for (k, v) in moves.items()
-                    ),
-                }
-                await self.conn.write_json(data)
-            else:
-                raise Error(f"unknown message: {msg}")
 
+    # Handlers for each packet type received while running the game.
+    # Each returns `True` if the game has finished.
+
+    async def _on_done(self, packet, step: StepFunc) -> bool:
+        print("Received finish signal")
+        return True
+
+    async def _on_warning(self, packet, step: StepFunc) -> bool:
+        print("Received warning:", packet["msg"])
+        return False
 
-def play(name: str, host: str, port: Union[int, str], step: StepFunc) -> None:
+    async def _on_error(self, packet, step: StepFunc) -> bool:
+        print(f"Recevied error:", packet["msg"])
+        return True
+
+    async def _on_update(self, packet, step: StepFunc) -> bool:
+        if self.reuse_entities:
+            entities = Entities.reusing(packet["data"], self._entities)
+            self._entities = entities
+        else:
+            entities = Entities(packet["data"])
+        moves = step(self.id, self.world, entities)
+
+        # the packet has a fixed layout, so write it directly
+        parts = [
+            _MOVE_FMT % (k, _DIRECTION_JSON.get(v) or _json_dumps(v))
+            for (k, v) in moves.items()
+        ]
+        msg = _MOVES_HEAD + b",".join(parts) + _MOVES_TAIL
+        if _DEBUG:
+            print(f"Sending: {msg.decode('utf-8')}")
+        await self.conn.write(msg)
+        return False
+
+    _HANDLERS = {
+        "done": _on_done,
+        "warning": _on_warning,
+        "error": _on_error,
+        "update": _on_update,
+    }
+
+
+def play(
+    name: str,
+    host: str,
+    port: Union[int, str],
+    step: StepFunc,
+    reuse_entities: bool = False,
+) -> None:
     """Play the game as a new (or returning) client.
 
     Connects to the server with given `host` and `port`.
@@ -308,6 +545,9 @@ def play(name: str, host: str, port: Union[int, str], step: StepFunc) -> None:
     their player ID, the world map, and the current positions of all entities;
     the function should return a list of movements to be made
     by all bees owned by their player ID.
+    If `reuse_entities` is set, entity objects are updated in-place
+    and reused between rounds rather than created afresh;
+    in that case, copy any values you want to remember for later rounds.
 
     The movements are specified by the four cardinal directions:
     "North", "South", "East", or "West".
@@ -327,7 +567,7 @@ def play(name: str, host: str, port: Union[int, str], step: StepFunc) -> None:
     async def main() -> None:
         try:
             conn = await Connection.create(host, port)
-            client = await Client.register(conn, name)
+            client = await Client.register(conn, name, reuse_entities)
             await client.run(step)
         except Error as e:
             print(f"Fatal error: {e.message}")
@@ -337,6 +577,11 @@ def play(name: str, host: str, port: Union[int, str], step: StepFunc) -> None:
             # just don't handle Proactor always throwing exception on teardown
             asyncio.get_event_loop().run_until_complete(main())
         else:
-            asyncio.run(main())
+            try:
+                # also falls back for uvloop versions before 0.18 without `run`
+                from uvloop import run
+            except ImportError:
+                run = asyncio.run
+            run(main())
     except KeyboardInterrupt:
         print("Interrupted.")
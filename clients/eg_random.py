@@ -7,13 +7,15 @@ PLAYER_NAME = "Jim"
 SERVER_HOST = "127.0.0.1"
 SERVER_PORT = 49998
 
+DIRECTIONS = ("North", "South", "East", "West")
+
 
 def move_randomly(player: PlayerID, world: World, entities: Entities) -> Moves:
     """Move all bees randomly."""
-    result: Moves = {}
-    for bee in entities.bees_for(player):
-        result[bee.id] = random.choice(["North", "South", "East", "West"])
-    return result
+    my_bees = entities.bees_for(player)
+    # pick every direction at once, rather than one call per bee
+    picks = random.choices(DIRECTIONS, k=len(my_bees))
+    return {bee.id: direction for (bee, direction) in zip(my_bees, picks)}
 
 
 if __name__ == "__main__":